@@ -1,5 +1,6 @@
 from xsbe import transform
 import requests
+from functools import lru_cache
 from os import path
 
 def main():
@@ -12,16 +13,25 @@ def main():
         print(item['publish_date'], item['guid']['#value'], item['enclosure']['url'], item['title'] )
 
 
+@lru_cache(maxsize=8)
+def _build_parser(schema_file: str, mtime: float, ignore_unexpected: bool) -> transform.DocumentTransformer:
+    # mtime is only part of the cache key so that an edited schema gets rebuilt
+    with open(schema_file, "r") as file:
+        return transform.create_transformer(file, ignore_unexpected=ignore_unexpected)
+
+
 class FeedReader:
     def __init__(self, schema_file: str = f"{path.dirname(__file__)}/rss_schema.xml"):
-        with open(schema_file, "r") as file:
-            self._parser = transform.create_transformer(file, ignore_unexpected=True)
+        self._parser = _build_parser(schema_file, path.getmtime(schema_file), True)
+        # Reuses connections between calls to read_feed
+        self._session = requests.Session()
 
     def read_feed(self, url: str) -> dict:
-        response = requests.get(url)
-        response.raise_for_status()
-        response_xml = response.content
-        return self._parser.loads(response_xml)
+        with self._session.get(url, stream=True) as response:
+            response.raise_for_status()
+            # Let urllib3 undo any Content-Encoding (gzip) so the parser sees plain XML
+            response.raw.decode_content = True
+            return self._parser.load(response.raw)
 
 
 if __name__ == '__main__':
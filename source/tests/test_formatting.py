@@ -1,4 +1,6 @@
-from io import StringIO
+from io import BytesIO, StringIO
+
+import pytest
 
 from xsbe import transform
 
@@ -21,3 +23,77 @@ def test_basic_formatting():
     document = parser.dumps(data)
 
     assert document == expected_result
+
+
+def test_formatting_without_declaration():
+    schema = """
+    <person id="20" xsbe:type="flatten" xmlns:xsbe="http://xsbe.couling.uk">
+      <name>Philip</name>
+    </person>
+    """
+
+    data = {
+        'id': 21,
+        'name': 'Alan'
+    }
+
+    parser = transform.create_transformer(StringIO(schema), ignore_unexpected=True)
+
+    assert parser.dumps(data, xml_declaration=False) == "<person id=\"21\"><name>Alan</name></person>"
+    output = BytesIO()
+    parser.dump(output, data)
+    assert output.getvalue().decode("utf-8") == parser.dumps(data)
+
+
+def test_formatting_nested_errors():
+    schema = """
+    <people xmlns:xsbe="http://xsbe.couling.uk">
+      <group>
+        <leader xsbe:type="mandatory">Philip</leader>
+        <person xsbe:type="repeating">Alan</person>
+      </group>
+    </people>
+    """
+
+    parser = transform.create_transformer(StringIO(schema))
+
+    with pytest.raises(KeyError, match="leader"):
+        parser.dumps({'group': {'person': ['Alan']}})
+
+    with pytest.raises(TypeError, match="person must be a list"):
+        parser.dumps({'group': {'leader': 'Philip', 'person': 'Alan'}})
+
+
+def test_formatting_namespaces():
+    schema = """
+    <feed xmlns="http://www.w3.org/2005/Atom" xmlns:xsbe="http://xsbe.couling.uk">
+      <entry xsbe:type="repeating">Philip</entry>
+    </feed>
+    """
+
+    parser = transform.create_transformer(StringIO(schema))
+    data = {'entry': ['Alan', 'Also Alan']}
+
+    output = BytesIO()
+    parser.dump(output, data)
+    assert output.getvalue().decode("utf-8") == parser.dumps(data)
+    assert parser.dumps(data).count("xmlns") == 1
+    assert parser.loads(parser.dumps(data)) == data
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'us-ascii', 'iso-8859-1'])
+def test_formatting_encoding(encoding: str):
+    schema = """
+    <people xmlns:xsbe="http://xsbe.couling.uk">
+      <person xsbe:type="repeating">Philip</person>
+    </people>
+    """
+
+    data = {'person': ['é', '€']}
+
+    parser = transform.create_transformer(StringIO(schema))
+
+    output = BytesIO()
+    parser.dump(output, data, encoding=encoding)
+    assert parser.dumps(data, encoding=encoding) == output.getvalue().decode(encoding)
+    assert parser.loads(output.getvalue()) == data
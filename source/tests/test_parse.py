@@ -1,7 +1,18 @@
 import pytest
 import datetime
+import sys
+from xml.etree import ElementTree
 from xsbe import transform
-from io import StringIO
+from io import BytesIO, StringIO
+
+
+@pytest.fixture(params=[False, True], ids=["etree", "lxml"])
+def use_lxml(request, monkeypatch) -> bool:
+    # Runs a test against each parsing backend, skipping lxml when it is not installed
+    if request.param and transform._lxml_etree is None:
+        pytest.skip("lxml 5.0 or later is not installed")
+    monkeypatch.setattr(transform, "_HAS_LXML", request.param)
+    return request.param
 
 
 def test_flatten():
@@ -174,6 +185,32 @@ def test_friendly_name_duplicates_error():
         parser.loads(document)
 
 
+def test_friendly_name_unexpected_child_error():
+    schema = """
+    <xsbe:schema-by-example xmlns:xsbe="http://xsbe.couling.uk">
+      <xsbe:root>
+        <people>
+          <person name="Philip" xsbe:value-from="name"/>
+        </people>
+      </xsbe:root>
+    </xsbe:schema-by-example>
+    """
+
+    document = """
+    <people>
+        <person name="Alan"><age>42</age></person>
+    </people>
+    """
+
+    parser = transform.create_transformer(StringIO(schema))
+
+    with pytest.raises(transform.UnexpectedElement):
+        parser.loads(document)
+
+    parser = transform.create_transformer(StringIO(schema), ignore_unexpected=True)
+    assert parser.loads(document) == {'person': 'Alan'}
+
+
 def test_int():
     schema = """
     <xsbe:schema-by-example xmlns:xsbe="http://xsbe.couling.uk">
@@ -280,8 +317,13 @@ def _tz(**kwargs) -> datetime.timezone:
         ('2020-12-31 11:45:23+01:00', datetime.datetime(2020, 12, 31, 11, 45, 23, tzinfo=_tz(hours=1))),
         ('2020-12-31T11:45:23+01:00', datetime.datetime(2020, 12, 31, 11, 45, 23, tzinfo=_tz(hours=1))),
         ('2020-12-31T11:45:23Z', datetime.datetime(2020, 12, 31, 11, 45, 23, tzinfo=_tz(hours=0))),
+        ('2020-12-31Z', datetime.datetime(2020, 12, 31, tzinfo=_tz(hours=0))),
         ('Mon, 16 Nov 2009 13:32:02 +0400', datetime.datetime(2009, 11, 16, 13, 32, 2, tzinfo=_tz(hours=4))),
         ('Mon, 16 Nov 2009 13:32:02', datetime.datetime(2009, 11, 16, 13, 32, 2)),
+        ('Mon, 16 Nov 2009 13:32:02 -0130',
+         datetime.datetime(2009, 11, 16, 13, 32, 2, tzinfo=_tz(hours=-1, minutes=-30))),
+        ('Mon, 16 Nov 0009 13:32:02 +0400', datetime.datetime(2009, 11, 16, 13, 32, 2, tzinfo=_tz(hours=4))),
+        ('Mon, 16 Nov 2009 13:32:02 -0000', datetime.datetime(2009, 11, 16, 13, 32, 2)),
     ])
 def test_date(value: str, result: datetime):
     schema = f"""
@@ -307,3 +349,219 @@ def test_date(value: str, result: datetime):
     assert data['value'].tzinfo == result.tzinfo
 
 
+_NEEDS_311 = pytest.mark.skipif(sys.version_info < (3, 11), reason="fromisoformat() only reads this from 3.11")
+
+
+@pytest.mark.parametrize(
+    ('example', 'value', 'result'), [
+        (' 42', ' 43', 43),
+        ('1_000', '2_000', 2000),
+        (' 4.2', '4.3', 4.3),
+        pytest.param('2020-12-31T11:45:23+0100', '2021-01-01T10:00:00+0200',
+                     datetime.datetime(2021, 1, 1, 10, tzinfo=_tz(hours=2)), marks=_NEEDS_311),
+        pytest.param('20201231T114523', '20210101T100000', datetime.datetime(2021, 1, 1, 10), marks=_NEEDS_311),
+    ])
+def test_attribute_type_detection(example: str, value: str, result):
+    # Attribute values are not stripped, so surrounding whitespace reaches the type detection
+    schema = f"""
+    <person value="{example}"/>
+    """
+
+    parser = transform.create_transformer(StringIO(schema))
+
+    assert parser.loads(f'<person value="{value}"/>') == {'value': result}
+
+
+def test_zulu_date_requires_zulu():
+    # An example ending in Z always selects the Z only format, whichever Python version is parsing the schema
+    schema = """
+    <person>
+      <value>2020-12-31T11:45:23Z</value>
+    </person>
+    """
+
+    parser = transform.create_transformer(StringIO(schema))
+
+    assert parser.loads("<person><value>2021-01-01T10:00:00Z</value></person>") == {
+        'value': datetime.datetime(2021, 1, 1, 10, tzinfo=datetime.timezone.utc),
+    }
+    with pytest.raises(ValueError):
+        parser.loads("<person><value>2021-01-01</value></person>")
+    with pytest.raises(ValueError):
+        parser.loads("<person><value>2021-01-01T10:00:00+01:00</value></person>")
+
+
+def test_load_skips_unexpected_subtree(use_lxml: bool):
+    schema = """
+    <xsbe:schema-by-example xmlns:xsbe="http://xsbe.couling.uk">
+      <xsbe:root>
+        <people>
+          <person xsbe:type="repeating" xsbe:name="people">Philip</person>
+        </people>
+      </xsbe:root>
+    </xsbe:schema-by-example>
+    """
+
+    document = b"""<?xml version="1.0" encoding="UTF-8"?>
+    <people>
+        <person>Alan</person>
+        <group>
+            <person>Not Alan</person>
+        </group>
+        <person>Also Alan</person>
+    </people>
+    """
+
+    parser = transform.create_transformer(StringIO(schema), ignore_unexpected=True)
+    data = parser.load(BytesIO(document))
+
+    assert data == {'people': ['Alan', 'Also Alan']}
+
+
+def test_external_entities_not_resolved(tmp_path, use_lxml: bool):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("secret")
+
+    schema = """
+    <people>
+      <person>Philip</person>
+    </people>
+    """
+
+    document = f"""<!DOCTYPE people [<!ENTITY name SYSTEM "{secret.as_uri()}">]>
+    <people>
+        <person>&name;</person>
+    </people>
+    """
+
+    parser = transform.create_transformer(StringIO(schema), ignore_unexpected=True)
+
+    with pytest.raises(SyntaxError):
+        parser.loads(document.encode())
+
+
+def test_encoding_declaration_in_text(use_lxml: bool):
+    schema = """<?xml version="1.0" encoding="UTF-8"?>
+    <people>
+      <person xsbe:type="repeating" xsbe:name="people" xmlns:xsbe="http://xsbe.couling.uk">Philip</person>
+    </people>
+    """
+
+    document = """<?xml version="1.0" encoding="UTF-8"?>
+    <people>
+        <person>Alan</person>
+    </people>
+    """
+
+    parser = transform.create_transformer(StringIO(schema))
+
+    assert parser.load(StringIO(document)) == {'people': ['Alan']}
+    assert parser.loads(document) == {'people': ['Alan']}
+    assert parser.load(BytesIO(document.encode())) == {'people': ['Alan']}
+
+
+def test_malformed_document(use_lxml: bool):
+    parser = transform.create_transformer(StringIO("<people><person>Philip</person></people>"))
+
+    with pytest.raises(ElementTree.ParseError):
+        parser.loads("<people><person>Alan</people>")
+    with pytest.raises(ElementTree.ParseError):
+        parser.load(BytesIO(b"<people><person>Alan</people>"))
+
+
+def test_large_documents(use_lxml: bool):
+    # lxml would normally refuse these, ElementTree has no such limits
+    parser = transform.create_transformer(StringIO("<people><person>Philip</person></people>"), ignore_unexpected=True)
+    text = "Alan" * 3_000_000
+    nested = "<group>" * 1000 + "</group>" * 1000
+
+    assert parser.loads(f"<people><person>{text}</person>{nested}</people>") == {'person': text}
+
+
+def test_comments_ignored(use_lxml: bool):
+    schema = """
+    <people xmlns:xsbe="http://xsbe.couling.uk">
+      <!-- Comments in the schema are not elements -->
+      <person xsbe:type="repeating" xsbe:name="people">Philip</person>
+    </people>
+    """
+
+    document = """
+    <people>
+        <!-- Nor are they in the document -->
+        <person>Alan</person>
+    </people>
+    """
+
+    parser = transform.create_transformer(StringIO(schema), ignore_unexpected=False)
+    data = parser.loads(document)
+
+    assert data == {'people': ['Alan']}
+
+
+@pytest.mark.parametrize(
+    ('value', 'result'), [
+        ('true', True),
+        ('True', True),
+        ('YES', True),
+        ('tRuE', True),
+        ('no', False),
+        ('False', False),
+        ('F', False),
+    ])
+def test_boolean(value: str, result: bool):
+    schema = """
+    <person xsbe:type="flatten" xmlns:xsbe="http://xsbe.couling.uk">
+      <value>true</value>
+    </person>
+    """
+
+    document = f"""
+    <person>
+      <value>{value}</value>
+    </person>
+    """
+
+    parser = transform.create_transformer(StringIO(schema), ignore_unexpected=True)
+    data = parser.loads(document)
+
+    assert data == {'value': result}
+
+
+def test_default_and_mandatory():
+    schema = """
+    <person xsbe:type="flatten" xmlns:xsbe="http://xsbe.couling.uk">
+      <name xsbe:type="mandatory">Philip</name>
+      <age xsbe:default="30">40</age>
+    </person>
+    """
+
+    parser = transform.create_transformer(StringIO(schema), ignore_unexpected=True)
+
+    assert parser.loads("<person><name>Alan</name></person>") == {'name': 'Alan', 'age': 30}
+    assert parser.loads("<person><name>Alan</name><age>25</age></person>") == {'name': 'Alan', 'age': 25}
+    with pytest.raises(transform.MissingElement):
+        parser.loads("<person><age>25</age></person>")
+
+
+def test_deep_schema():
+    # Building the transformer must not recurse per level of the schema
+    root = element = ElementTree.Element("level")
+    for _ in range(sys.getrecursionlimit() + 500):
+        element = ElementTree.SubElement(element, "level")
+    element.text = "Philip"
+
+    parser = transform.create_transformer(root)
+
+    assert parser.loads("<level><level/></level>") == {'level': {}}
+
+
+def test_transformer_without_document():
+    # Transformers built by hand are never finalized by a DocumentTransformer
+    person = transform.ElementNodeTransformer("person", "person", ignore_unexpected=False)
+    person.children["name"] = transform.TextNodeTransformer("name", "name", False, transform.TextTransformer())
+    person.attributes["id"] = transform.IntTransformer(result_name="id")
+
+    node = ElementTree.fromstring('<person id="3"><name>Alan</name></person>')
+    assert person.transform_from_xml(node) == {'name': 'Alan', 'id': 3}
+    assert ElementTree.tostring(person.transform_to_xml({'name': 'Alan', 'id': 3})) == ElementTree.tostring(node)
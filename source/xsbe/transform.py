@@ -1,12 +1,29 @@
 import abc
 import email.utils
 import io
+import re
+import sys
 from contextlib import ExitStack
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, BinaryIO, NamedTuple, Optional, TextIO, Union
+
 from xml.etree import ElementTree
 
+# lxml parses faster than ElementTree so it is used to read documents when installed.  Output is always built with
+# ElementTree since creating lxml elements one at a time from Python is slower.
+try:
+    from lxml import etree as _lxml_etree
+    # Before 5.0 lxml cannot be told to resolve only internal entities, so external ones would be read from disk.
+    # Before libxml2 2.11 huge_tree (see _create_parser) also turned off its protection against entity expansion.
+    if _lxml_etree.LXML_VERSION < (5,) or _lxml_etree.LIBXML_VERSION < (2, 11):
+        _lxml_etree = None
+except ImportError:
+    _lxml_etree = None
+_HAS_LXML = _lxml_etree is not None
+_LXML_SYNTAX_ERRORS = (_lxml_etree.XMLSyntaxError,) if _HAS_LXML else ()
+
 XSBE_SCHEMA_URI = "{http://xsbe.couling.uk}"
 
 _SCHEMA_NODE_NAME = f"{XSBE_SCHEMA_URI}schema-by-example"
@@ -25,6 +42,57 @@ _TYPE_FLATTEN = 'flatten'
 
 _VALUE_KEY = '#value'
 
+# How a child element's value is merged into its parent's result
+_KIND_SCALAR = 0
+_KIND_FLATTEN = 1
+_KIND_REPEATING = 2
+
+
+def _create_parser() -> ElementTree.XMLParser:
+    if _HAS_LXML:
+        # lxml keeps comments and processing instructions in the tree, ElementTree drops them.  Drop them here too
+        # so that both backends present the same children.  Whitespace between elements and xml:id tracking are
+        # never used by the transformers so don't make lxml keep them either.  As with ElementTree only internal
+        # entities are expanded and the network is never used, so documents cannot pull in files or remote content.
+        # huge_tree lifts libxml2's limits on text size and nesting (from 256 to 2048 levels) which ElementTree does
+        # not have.  Entity expansion is still limited.
+        return _lxml_etree.XMLParser(remove_comments=True, remove_pis=True, remove_blank_text=True, collect_ids=False,
+                                     resolve_entities="internal", no_network=True, huge_tree=True)
+    return ElementTree.XMLParser()
+
+
+def _xml_declaration(encoding: str) -> str:
+    # Written by hand since tostring(encoding="unicode") never writes one, and so that dump matches dumps
+    return f"<?xml version='1.0' encoding='{encoding}'?>\n"
+
+
+def _parse_xml(source: Union[TextIO, BinaryIO, str, Path]) -> ElementTree.ElementTree:
+    # lxml refuses text streams which carry an encoding declaration, so those are always left to ElementTree
+    if not _HAS_LXML or isinstance(source, io.TextIOBase):
+        return ElementTree.parse(source)
+    try:
+        return _lxml_etree.parse(source, _create_parser())
+    except _LXML_SYNTAX_ERRORS as e:
+        raise _parse_error(e) from e
+
+
+def _parse_xml_string(content: Union[str, bytes]) -> ElementTree.Element:
+    # Fed straight to the parser rather than wrapping the content in a file object
+    parser = _create_parser()
+    try:
+        parser.feed(content)
+        return parser.close()
+    except _LXML_SYNTAX_ERRORS as e:
+        raise _parse_error(e) from e
+
+
+def _parse_error(error: SyntaxError) -> ElementTree.ParseError:
+    # lxml errors are raised as ElementTree's so that callers catch the same exception whichever backend is in use
+    result = ElementTree.ParseError(error.msg)
+    result.code = error.code
+    result.position = error.position
+    return result
+
 
 class ParseFailure(Exception):
     pass
@@ -71,6 +139,8 @@ class MissingCrossReference(ParseFailure):
 
 
 class ValueTransformer(abc.ABC):
+    __slots__ = ("result_name", "default_value")
+
     result_name: str
 
     def __init__(self, result_name: Optional[str] = None):
@@ -87,6 +157,8 @@ class ValueTransformer(abc.ABC):
 
 
 class TextTransformer(ValueTransformer):
+    __slots__ = ()
+
     def transform_from_xml(self, value: str) -> str:
         return value
 
@@ -95,6 +167,8 @@ class TextTransformer(ValueTransformer):
 
 
 class IntTransformer(ValueTransformer):
+    __slots__ = ()
+
     def transform_from_xml(self, value: str) -> int:
         return int(value)
 
@@ -103,6 +177,8 @@ class IntTransformer(ValueTransformer):
 
 
 class FloatTransformer(ValueTransformer):
+    __slots__ = ()
+
     def transform_from_xml(self, value: str) -> float:
         return float(value)
 
@@ -111,6 +187,8 @@ class FloatTransformer(ValueTransformer):
 
 
 class BooleanTransformer(ValueTransformer):
+    __slots__ = ()
+
     MAP = {
         "y": True,
         "yes": True,
@@ -121,54 +199,119 @@ class BooleanTransformer(ValueTransformer):
         "false": False,
         "f": False,
     }
+    # The usual spellings so that most values can be looked up without lower() creating a new string
+    CASED_MAP = {cased: result for key, result in MAP.items() for cased in (key, key.upper(), key.capitalize())}
 
     def transform_from_xml(self, value: str) -> bool:
-        return self.MAP[value.lower()]
+        result = self.CASED_MAP.get(value)
+        if result is None:
+            result = self.MAP[value.lower()]
+        return result
 
     def transform_to_xml(self, value):
         return "true" if value else "false"
 
 
+# From 3.11 fromisoformat() reads a trailing Z itself and returns a UTC datetime, saving the slice and the replace().
+_FROMISOFORMAT_READS_ZULU = sys.version_info >= (3, 11)
+
+
+# Documents such as feeds and logs tend to repeat the same few dates.  The results are immutable so sharing them is
+# safe.
+@lru_cache(maxsize=1024)
+def _parse_iso_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
 class ISODateTransformer(ValueTransformer):
+    __slots__ = ()
+
     def transform_from_xml(self, value) -> datetime:
-        return datetime.fromisoformat(value)
+        return _parse_iso_datetime(value)
 
     def transform_to_xml(self, value: Union[datetime, float]) -> str:
-        if isinstance(value, float):
-            value = datetime.fromtimestamp(value)
-        return value.isoformat()
+        isoformat = getattr(value, "isoformat", None)
+        if isoformat is None:
+            # Not a datetime so treat it as a timestamp
+            return datetime.fromtimestamp(value).isoformat()
+        return isoformat()
 
 
 class ISOZuluDateTransformer(ValueTransformer):
+    __slots__ = ()
+
     def transform_from_xml(self, value) -> datetime:
         if value[-1] != "Z":
             raise ValueError("Expected Z timezone")
-        result = datetime.fromisoformat(value[:-1])
+        if _FROMISOFORMAT_READS_ZULU:
+            try:
+                return _parse_iso_datetime(value)
+            except ValueError:
+                # Date only values such as "2020-12-31Z" are still rejected, as is any other timezone before the Z
+                pass
+        result = _parse_iso_datetime(value[:-1])
         if result.tzinfo is not None:
             raise ValueError(f"Invalid date format {value}")
         return result.replace(tzinfo=timezone.utc)
 
     def transform_to_xml(self, value: Union[datetime, float]) -> str:
-        if isinstance(value, float):
-            value = datetime.fromtimestamp(value)
-        return value.isoformat() + "Z"
+        isoformat = getattr(value, "isoformat", None)
+        if isoformat is None:
+            # Not a datetime so treat it as a timestamp
+            return datetime.fromtimestamp(value).isoformat() + "Z"
+        return isoformat() + "Z"
 
 
 class EmailDateTransformer(ValueTransformer):
+    __slots__ = ()
+
+    # The layout almost every feed uses, eg: "Mon, 16 Nov 2009 13:32:02 +0400".  Anything else is left to email.utils.
+    PATTERN = re.compile(r"(?:[A-Za-z]{3}, )?(\d{1,2}) ([A-Za-z]{3}) (\d{4}) (\d{2}):(\d{2}):(\d{2})(?: ([+-]\d{4}))?")
+    MONTHS = {name: number for number, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+    _timezones = {}
+
     def transform_from_xml(self, value) -> datetime:
+        match = self.PATTERN.fullmatch(value)
+        if match is not None:
+            day, month, year, hour, minute, second, offset = match.groups()
+            month = self.MONTHS.get(month.lower())
+            year = int(year)
+            # email.utils reads years below 100 as two digit years, eg: 0009 is 2009, so leave those to it
+            if month is not None and year >= 100:
+                return datetime(year, month, int(day), int(hour), int(minute), int(second),
+                                tzinfo=self._timezone(offset))
         try:
             return email.utils.parsedate_to_datetime(value)
-            #return datetime.fromtimestamp(time.mktime(email.utils.parsedate_tz(value)))
-        except TypeError:
-            raise ValueError(f"Invalid date {value}")
+        except (TypeError, ValueError) as e:
+            # Older Pythons raise TypeError for unparsable dates, newer ones raise ValueError
+            raise ValueError(f"Invalid date {value}") from e
 
     def transform_to_xml(self, value: Union[datetime, float]) -> str:
         if isinstance(value, datetime):
-            value = value.timestamp()
+            # Same output as formatdate() (UTC, written as -0000) without the round trip through a timestamp
+            return email.utils.format_datetime(value.astimezone(timezone.utc).replace(tzinfo=None))
         return email.utils.formatdate(timeval=value, localtime=False)
 
+    @classmethod
+    def _timezone(cls, offset: Optional[str]) -> Optional[timezone]:
+        # Like email.utils, -0000 means the offset is unknown so the result is naive
+        if offset is None or offset == "-0000":
+            return None
+        try:
+            return cls._timezones[offset]
+        except KeyError:
+            minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+            result = timezone(timedelta(minutes=-minutes if offset[0] == "-" else minutes))
+            cls._timezones[offset] = result
+            return result
+
+
+class BaseNodeTransformer(abc.ABC):  # pylint: disable=too-many-instance-attributes
+    __slots__ = ("node_name", "result_name", "is_optional", "is_repeating", "union_group", "flatten", "attributes",
+                 "default_value", "_ignore_unexpected", "_attribute_readers", "_attribute_defaults",
+                 "_attribute_writers")
 
-class BaseNodeTransformer(abc.ABC):
     node_name: str
     result_name: str
     is_optional: bool
@@ -195,43 +338,73 @@ class BaseNodeTransformer(abc.ABC):
         self._ignore_unexpected = ignore_unexpected
         self.flatten = False
         self.default_value = None
-
-    def _parse_attributes(self, node: ElementTree.Element) -> dict:
+        # None until finalize() has run
+        self._attribute_readers = None
+        self._attribute_defaults = ()
+        self._attribute_writers = ()
+
+    def finalize(self):
+        # Called once the schema is complete to precompute anything needed while parsing.  Transformers must not be
+        # modified after this.  Only this transformer is finalized, DocumentTransformer finalizes every one in turn.
+        # Transformers used without a DocumentTransformer finalize themselves the first time they are used.
+        self._attribute_readers = {name: (transformer.result_name, transformer.transform_from_xml)
+                                   for name, transformer in self.attributes.items()}
+        self._attribute_defaults = tuple((transformer.result_name, transformer.default_value)
+                                         for transformer in self.attributes.values()
+                                         if transformer.default_value is not None)
+        self._attribute_writers = tuple((name, transformer.result_name, transformer.default_value,
+                                         transformer.transform_to_xml)
+                                        for name, transformer in self.attributes.items())
+
+    def _parse_attributes(self, attributes: dict[str, str]) -> dict:
+        if self._attribute_readers is None:
+            self.finalize()
         result = {}
-        for name, value in node.attrib.items():
-            try:
-                transformer = self.attributes[name]
-            except KeyError:
-                if self._ignore_unexpected:
-                    continue
-                raise UnexpectedAttribute(name)
-            result[transformer.result_name] = transformer.transform_from_xml(value)
-        for transformer in self.attributes.values():
-            if transformer.result_name not in result:
-                default = transformer.default_value
-                if default is not None:
-                    result[transformer.result_name] = default
+        readers = self._attribute_readers
+        if self._ignore_unexpected:
+            # Only the attributes in the schema matter, so look those up instead of scanning every attribute present
+            for name, (result_name, transform_attribute) in readers.items():
+                value = attributes.get(name)
+                if value is not None:
+                    result[result_name] = transform_attribute(value)
+        else:
+            for name, value in attributes.items():
+                reader = readers.get(name)
+                if reader is None:
+                    raise UnexpectedAttribute(name)
+                result_name, transform_attribute = reader
+                result[result_name] = transform_attribute(value)
+        for result_name, default_value in self._attribute_defaults:
+            result.setdefault(result_name, default_value)
         return result
 
-    def _attributes_to_xml(self, value: dict, exclude_attribute: Optional[ElementTree.Element] = None
-                           ) -> dict[str, str]:
+    def _attributes_to_xml(self, value: dict) -> dict[str, str]:
+        if self._attribute_readers is None:
+            self.finalize()
         result = {}
-        for name, transformer in self.attributes.items():
-            if name == exclude_attribute:
-                continue
-            if transformer.result_name in value:
-                result[name] = transformer.transform_to_xml(value[transformer.result_name])
-            elif transformer.default_value is not None:
-                result[name] = transformer.transform_to_xml(transformer.default_value)
+        for name, result_name, default_value, transform_attribute in self._attribute_writers:
+            if result_name in value:
+                result[name] = transform_attribute(value[result_name])
+            elif default_value is not None:
+                result[name] = transform_attribute(default_value)
         return result
 
 
 class DocumentTransformer:
+    __slots__ = ("name", "root_transformer")
+
     root_transformer: BaseNodeTransformer
 
     def __init__(self, name: str, root_transformer: BaseNodeTransformer):
         self.name = name
         self.root_transformer = root_transformer
+        # Walked with an explicit stack rather than recursion, as with _create_element_transformer
+        pending = [root_transformer]
+        while pending:
+            transformer = pending.pop()
+            transformer.finalize()
+            if isinstance(transformer, ElementNodeTransformer):
+                pending.extend(transformer.children.values())
 
     def transform_from_xml(self, value: ElementTree.Element):
         if value.tag != self.name:
@@ -242,119 +415,151 @@ class DocumentTransformer:
         return self.root_transformer.transform_to_xml(value)
 
     def load(self, file: Union[TextIO, BinaryIO, str, Path]) -> Any:
-        document = ElementTree.parse(file)
-        return self.transform_from_xml(document.getroot())
+        return self.transform_from_xml(_parse_xml(file).getroot())
 
     def loads(self, content: Union[str, bytes]) -> Any:
-        if isinstance(content, str):
-            content_reader = io.StringIO(content)
-        elif isinstance(content, bytes):
-            content_reader = io.BytesIO(content)
-        else:
+        if not isinstance(content, (str, bytes)):
             raise TypeError(f"Expected content of type str or bytes, go {type(content).__name__}")
-        return self.load(content_reader)
+        return self.transform_from_xml(_parse_xml_string(content))
 
     def dump(self, file: BinaryIO, value, **kwargs):
-        root_node = self.transform_to_xml(value)
-        document = ElementTree.ElementTree(root_node)
+        encoding = kwargs.pop("encoding", "utf-8")
+        if kwargs.pop("xml_declaration", True):
+            file.write(_xml_declaration(encoding).encode(encoding))
+        document = ElementTree.ElementTree(self.transform_to_xml(value))
         return document.write(
             file,
-            encoding=kwargs.pop("encoding", "utf-8"),
-            xml_declaration=kwargs.pop("xml_declaration", True),
+            encoding=encoding,
+            xml_declaration=False,
             **kwargs,
         )
 
     def dumps(self, value, **kwargs) -> str:
-        output = io.BytesIO()
-        self.dump(output, value, **kwargs)
-        return output.getvalue().decode(kwargs.get("encoding", "utf-8"))
+        encoding = kwargs.pop("encoding", "utf-8")
+        xml_declaration = kwargs.pop("xml_declaration", True)
+        root_node = self.transform_to_xml(value)
+        if encoding.lower() in ("utf-8", "utf8"):
+            # UTF-8 can hold every character, so serialize straight to str rather than encoding to bytes only to
+            # decode them again
+            document = ElementTree.tostring(root_node, encoding="unicode", **kwargs)
+        else:
+            # Other encodings need characters they cannot hold escaping, just as dump() does
+            document = ElementTree.tostring(root_node, encoding=encoding, xml_declaration=False, **kwargs
+                                            ).decode(encoding)
+        if xml_declaration:
+            return _xml_declaration(encoding) + document
+        return document
 
 
-class ElementNodeTransformer(BaseNodeTransformer):
+class ElementNodeTransformer(BaseNodeTransformer):  # pylint: disable=too-many-instance-attributes
+    __slots__ = ("children", "_dispatch", "_repeating_names", "_defaults", "_required", "_to_xml_children")
 
     children: dict[str, BaseNodeTransformer]
 
     def __init__(self, node_name: str, result_name: str, ignore_unexpected: bool):
         super().__init__(node_name, result_name, ignore_unexpected)
         self.children = {}
+        self._dispatch = None
+        self._repeating_names = ()
+        self._defaults = ()
+        self._required = ()
+        self._to_xml_children = ()
+
+    def finalize(self):
+        super().finalize()
+        self._dispatch = {}
+        self._repeating_names = tuple(child.result_name for child in self.children.values() if child.is_repeating)
+        self._defaults = tuple((child.result_name, child.default_value) for child in self.children.values()
+                               if child.is_optional and child.default_value is not None)
+        self._required = tuple((name, child.result_name, child.is_repeating) for name, child in self.children.items()
+                               if not child.is_optional)
+        for name, child in self.children.items():
+            if child.is_repeating:
+                kind = _KIND_REPEATING
+            elif child.flatten:
+                kind = _KIND_FLATTEN
+            else:
+                kind = _KIND_SCALAR
+            # The bound transform_from_xml saves looking it up on the child for every element parsed
+            self._dispatch[name] = (child.result_name, kind, child, child.transform_from_xml)
+        self._to_xml_children = tuple(
+            (kind, result_name, child.is_optional, child.default_value, child.transform_to_xml)
+            for result_name, kind, child, _ in self._dispatch.values()
+        )
 
     def transform_from_xml(self, node: ElementTree.Element):
-        result = self._parse_children(node)
-        self._set_defaults(result)
-        if self.attributes:
-            result.update(self._parse_attributes(node))
-        return result
+        if self._dispatch is None:
+            self.finalize()
+        return self._complete_result(self._parse_children(node), node.attrib)
 
     def transform_to_xml(self, value) -> ElementTree.Element:
-        node = ElementTree.Element(self.node_name)
-        node.attrib = self._attributes_to_xml(value)
+        if self._dispatch is None:
+            self.finalize()
+        node = ElementTree.Element(self.node_name, self._attributes_to_xml(value))
         node.extend(self._children_to_xml(value))
         return node
 
-    def _children_to_xml(self, value: dict) -> list[Union[ElementTree.Element, str]]:
+    def _children_to_xml(self, value: dict) -> list[ElementTree.Element]:
+        # Must stay a list: ElementTree's C extend() replaces any error raised by a generator with a TypeError
         result = []
-        for child in self.children.values():
-            if child.is_repeating:
-                child_value = value.get(child.result_name, [])
-            elif child.flatten:
-                child_value = value
-            elif child.is_optional:
-                child_value = value.get(child.result_name, child.default_value)
-                if child_value is None:
-                    continue
-            else:
-                child_value = value[child.result_name]
-
-            if child.is_repeating:
+        for kind, result_name, is_optional, default_value, transform_child in self._to_xml_children:
+            if kind == _KIND_REPEATING:
+                child_value = value.get(result_name, [])
                 if not isinstance(child_value, list):
-                    raise TypeError(f"{child.result_name} must be a list, received {type(child_value)}")
-                for v in child_value:
-                    result.append(child.transform_to_xml(v))
+                    raise TypeError(f"{result_name} must be a list, received {type(child_value)}")
+                result.extend(map(transform_child, child_value))
+            elif kind == _KIND_FLATTEN:
+                result.append(transform_child(value))
             else:
+                child_value = value.get(result_name, default_value) if is_optional else value[result_name]
                 if child_value is not None:
-                    result.append(child.transform_to_xml(child_value))
+                    result.append(transform_child(child_value))
+        return result
+
+    def _new_result(self) -> dict:
+        # Initialise any child that is a list to an empty list
+        return {result_name: [] for result_name in self._repeating_names}
 
+    def _complete_result(self, result: dict, attributes: dict[str, str]) -> dict:
+        self._set_defaults(result)
+        if self.attributes:
+            result.update(self._parse_attributes(attributes))
         return result
 
     def _parse_children(self, node: ElementTree.Element) -> dict:
-        # Initialise any child that is a list to an empty list
-        result = {child.result_name: [] for child in self.children.values() if child.is_repeating}
+        result = self._new_result()
+        dispatch = self._dispatch
+        ignore_unexpected = self._ignore_unexpected
 
         # Process the children
         for child in node:
-            if isinstance(child, str):
-                raise ParseFailure(f"Unexpected text node '{child}'")
-            try:
-                child_transformer = self.children[child.tag]
-            except KeyError:
-                if self._ignore_unexpected:
+            entry = dispatch.get(child.tag)
+            if entry is None:
+                if ignore_unexpected:
                     continue
                 raise UnexpectedElement(child.tag)
-            if child_transformer.is_repeating:
-                result[child_transformer.result_name].append(child_transformer.transform_from_xml(child))
+            result_name, kind, _, transform_child = entry
+            if kind == _KIND_REPEATING:
+                result[result_name].append(transform_child(child))
+            elif kind == _KIND_FLATTEN:
+                result.update(transform_child(child))
             else:
-                if child_transformer.flatten:
-                    result.update(child_transformer.transform_from_xml(child))
-                else:
-                    if child_transformer.result_name in result:
-                        raise DuplicateElement(child.tag, child_transformer.result_name)
-                    result[child_transformer.result_name] = child_transformer.transform_from_xml(child)
+                if result_name in result:
+                    raise DuplicateElement(child.tag, result_name)
+                result[result_name] = transform_child(child)
 
         return result
 
     def _set_defaults(self, result_dict: dict):
-        for name, transformer in self.children.items():
-            if transformer.result_name not in result_dict:
-                if transformer.is_optional:
-                    if transformer.default_value is not None:
-                        result_dict[transformer.result_name] = transformer.default_value
-                else:
-                    raise MissingElement(name)
-            elif transformer.is_repeating and not transformer.is_optional and not result_dict[transformer.result_name]:
+        for result_name, default_value in self._defaults:
+            result_dict.setdefault(result_name, default_value)
+        for name, result_name, is_repeating in self._required:
+            if result_name not in result_dict or (is_repeating and not result_dict[result_name]):
                 raise MissingElement(name)
 
 
 class TextNodeTransformer(BaseNodeTransformer):
+    __slots__ = ("value_from", "_text_transformer")
 
     def __init__(self, node_name: str, result_name: str, ignore_unexpected: bool,
                  text_transformer: ValueTransformer, default_value: Optional[str] = None):
@@ -365,16 +570,10 @@ class TextNodeTransformer(BaseNodeTransformer):
         self.value_from = None
 
     def transform_from_xml(self, node: ElementTree.Element):
+        if len(node) and not (self.value_from and self._ignore_unexpected):
+            raise UnexpectedElement(node[0].tag)
         if self.value_from:
-            if len(node) > 0:
-                if not self._ignore_unexpected:
-                    if isinstance(node.children, str):
-                        raise ParseFailure("Unexpected text node in %s", node.name)
-                    else:
-                        raise UnexpectedElement(node.children[0])
             value = node.attrib.get(self.value_from, None)
-        elif len(node):
-            raise UnexpectedElement(next(iter(node)))
         else:
             value = node.text
             if value is not None:
@@ -390,20 +589,20 @@ class TextNodeTransformer(BaseNodeTransformer):
             value = self._text_transformer.transform_from_xml(value)
 
         if self.attributes:
-            result = self._parse_attributes(node)
+            result = self._parse_attributes(node.attrib)
             result[_VALUE_KEY] = value
             return result
         else:
             return value
 
     def transform_to_xml(self, value) -> ElementTree.Element:
-        node = ElementTree.Element(self.node_name)
-        node.attrib = self._attributes_to_xml(value)
+        attributes = self._attributes_to_xml(value)
         text_value = self._text_transformer.transform_to_xml(value)
         if self.value_from is not None:
-            node.attrib[self.value_from] = text_value
-        else:
-            node.text = text_value
+            attributes[self.value_from] = text_value
+            return ElementTree.Element(self.node_name, attributes)
+        node = ElementTree.Element(self.node_name, attributes)
+        node.text = text_value
         return node
 
     def _children_to_xml(self, value) -> list[Union[ElementTree.Element, str]]:
@@ -422,7 +621,7 @@ def create_transformer(schema_document: Union[str, Path, TextIO, BinaryIO, Eleme
         with ExitStack() as stack:
             if isinstance(str, Path):
                 schema_document = stack.enter_context(open(schema_document, 'r'))
-            schema_document = ElementTree.parse(schema_document).getroot()
+            schema_document = _parse_xml(schema_document).getroot()
 
     if schema_document.tag == _SCHEMA_NODE_NAME:
         document_root: Optional[DocumentTransformer] = None
@@ -451,6 +650,22 @@ def _create_root_transformer(root_node: ElementTree.Element, ignore_unexpected:
 
 
 def _create_element_transformer(element: ElementTree.Element, ignore_unexpected: bool) -> BaseNodeTransformer:
+    # Walks the schema with an explicit stack rather than recursion so that building a transformer for a deeply nested
+    # schema does not hit the recursion limit.  Documents themselves are still transformed recursively.  Children are
+    # added to their parent as they are met so the schema order is kept.
+    root = _create_node_transformer(element, ignore_unexpected)
+    stack = [(element, root)]
+    while stack:
+        element, transformer = stack.pop()
+        if isinstance(transformer, ElementNodeTransformer):
+            for child in element:
+                child_transformer = _create_node_transformer(child, ignore_unexpected)
+                transformer.children[child.tag] = child_transformer
+                stack.append((child, child_transformer))
+    return root
+
+
+def _create_node_transformer(element: ElementTree.Element, ignore_unexpected: bool) -> BaseNodeTransformer:
     result_name = element.attrib.get(_ATTRIBUTE_RESULT_NAME, split_qualified_name(element.tag).name)
     exclude_attribute = None
     if element.text and element.text.strip():
@@ -468,7 +683,6 @@ def _create_element_transformer(element: ElementTree.Element, ignore_unexpected:
         result.value_from = value_from
     else:
         result = ElementNodeTransformer(element.tag, result_name, ignore_unexpected)
-        result.children = {child.tag: _create_element_transformer(child, ignore_unexpected) for child in element}
 
     element_name = split_qualified_name(element.tag)
     for name, value in element.attrib.items():
@@ -498,28 +712,44 @@ def _create_element_transformer(element: ElementTree.Element, ignore_unexpected:
 
 DATE_TRANSFORMERS = [ISODateTransformer, ISOZuluDateTransformer, EmailDateTransformer]
 
+# Like int() and float() these allow surrounding whitespace and underscores between digits
+_INT_PATTERN = re.compile(r"\s*[+-]?\d+(?:_\d+)*\s*")
+_FLOAT_PATTERN = re.compile(r"\s*[+-]?(?:\d+(?:_\d+)*\.(?:\d+(?:_\d+)*)?|\.\d+(?:_\d+)*)(?:[eE][+-]?\d+(?:_\d+)*)?\s*")
+# The date patterns only check the shape, they are deliberately loose.  Whether fromisoformat() takes forms such as
+# 20201231T114523 or a +0100 offset depends on the Python version, so the probe in _pick_text_type decides.
+_ISO_DATE_TIME = r"\d{4}-?(?:\d{2}-?\d{2}|W\d{2}-?\d?|\d{3})(?:[T ]\d{2}(?::?\d{2}(?::?\d{2}(?:[.,]\d+)?)?)?)?"
+_DATE_SHAPES = {
+    ISODateTransformer: re.compile(_ISO_DATE_TIME + r"(?:[+-]\d{2}(?::?\d{2}(?::?\d{2}(?:[.,]\d+)?)?)?)?"),
+    ISOZuluDateTransformer: re.compile(_ISO_DATE_TIME + r"Z"),
+    EmailDateTransformer: re.compile(r"(?:[A-Za-z]{3}, )?\d{1,2} [A-Za-z]{3} \d{2,4} \d{2}:\d{2}(?::\d{2})?(?: .+)?"),
+}
+
 
 def _identify_text_type(text: str, result_name: Optional[str] = None) -> ValueTransformer:
+    return _pick_text_type(text)(result_name=result_name)
+
+
+# Schemas repeat the same example values ("true", "0", ...) so the detected type is remembered per value.  Only the
+# type is cached since each node needs its own instance with its own result_name.
+@lru_cache(maxsize=1024)
+def _pick_text_type(text: str) -> type[ValueTransformer]:
     if text in BooleanTransformer.MAP:
-        return BooleanTransformer(result_name=result_name)
-    try:
-        float(text)
-    except ValueError:
-        pass
-    else:
-        if "." in text:
-            return FloatTransformer(result_name=result_name)
-        return IntTransformer(result_name=result_name)
+        return BooleanTransformer
+    if _INT_PATTERN.fullmatch(text):
+        return IntTransformer
+    if _FLOAT_PATTERN.fullmatch(text):
+        return FloatTransformer
 
     for date_type in DATE_TRANSFORMERS:
-        try:
-            transformer = date_type(result_name=result_name)
-            transformer.transform_from_xml(text)
-            return transformer
-        except ValueError:
-            pass
+        if _DATE_SHAPES[date_type].fullmatch(text):
+            try:
+                # The pattern only checks the shape, eg: it would allow month 13
+                date_type().transform_from_xml(text)
+            except ValueError:
+                continue
+            return date_type
 
-    return TextTransformer(result_name=result_name)
+    return TextTransformer
 
 
 class QualifiedName(NamedTuple):
@@ -527,6 +757,8 @@ class QualifiedName(NamedTuple):
     name: str
 
 
+# Schemas repeat the same few names many times.  Caching is safe because both the str and the result are immutable.
+@lru_cache(maxsize=4096)
 def split_qualified_name(tag: str) -> QualifiedName[Optional[str], str]:
     if tag[0] == "{":
         position = tag.index("}")